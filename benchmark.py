@@ -0,0 +1,176 @@
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from ortools import __version__ as ortools_version
+
+from decompose import solve_sharded
+from flow import solve_flow, solve_model
+from scheduler import build_model, make_solver, run_solver
+
+engines = ['flow', 'auto', 'cp-sat', 'sharded']
+kinds = ['random', 'tight', 'infeasible']
+
+
+def generate_instance(num_workers, num_days=7, num_shifts=2, staffing=0.5, density=0.3, kind='random', seed=0):
+    # Returns (preferences, coverage, min_shifts). staffing is the share of workers
+    # needed on every (day, shift), density the share of cells workers refuse.
+    # 'tight' asks every worker for an equal share of all shifts, so there is no slack;
+    # 'infeasible' asks for one shift more than that, which no roster can give.
+    rng = np.random.default_rng(seed)
+    prefs = (rng.random((num_workers, num_days, num_shifts)) < density).astype(np.int64)
+    coverage = max(1, int(round(staffing * num_workers)))
+    total = coverage * num_days * num_shifts
+    if kind == 'random':
+        min_shifts = min(2, total // num_workers)
+    elif kind == 'tight':
+        min_shifts = total // num_workers
+    elif kind == 'infeasible':
+        min_shifts = total // num_workers + 1
+    else:
+        raise ValueError('unknown instance kind %r' % kind)
+    return prefs, coverage, min_shifts
+
+
+def solve_case(engine, prefs, coverage, min_shifts, max_time_in_seconds):
+    # Returns (build_seconds, solve_seconds, result); the flow engine builds its network
+    # inside the solve, so all of its time counts as solving.
+    start = time.perf_counter()
+    if engine == 'flow':
+        result = solve_flow(prefs, coverage=coverage, min_shifts=min_shifts)
+        return 0.0, time.perf_counter() - start, result
+    if engine == 'sharded':
+        groups = np.arange(len(prefs)) % 4
+        result = solve_sharded(prefs, groups, coverage=coverage, min_shifts=min_shifts, engine='flow',
+                               max_processes=1, compare=False)
+        return 0.0, time.perf_counter() - start, result
+    schedule = build_model(prefs, coverage=coverage, min_shifts=min_shifts)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    if engine == 'auto':
+        result = solve_model(schedule, max_time_in_seconds=max_time_in_seconds)
+    else:
+        result = run_solver(schedule, make_solver(max_time_in_seconds))
+    return build_seconds, time.perf_counter() - start, result
+
+
+def run_case(engine, num_workers, num_days=7, num_shifts=2, staffing=0.5, density=0.3, kind='random', seed=0,
+             max_time_in_seconds=60, measure_memory=True):
+    prefs, coverage, min_shifts = generate_instance(num_workers, num_days, num_shifts, staffing, density, kind,
+                                                    seed)
+    build_seconds, solve_seconds, result = solve_case(engine, prefs, coverage, min_shifts, max_time_in_seconds)
+    # tracemalloc slows Python-heavy phases several times over, so peak memory comes
+    # from a second, traced run instead of the timed one.
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            solve_case(engine, prefs, coverage, min_shifts, max_time_in_seconds)
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return {
+        'engine': engine, 'kind': kind, 'workers': num_workers, 'days': num_days, 'shifts': num_shifts,
+        'coverage': coverage, 'min_shifts': min_shifts, 'density': density, 'seed': seed,
+        'build_seconds': build_seconds, 'solve_seconds': solve_seconds,
+        # Python-side allocations only; CP-SAT's own memory shows in process_max_rss_mb.
+        'peak_python_mb': peak,
+        # Peak resident memory of the whole benchmark process so far, not of this case:
+        # it never goes down, so after a large case every later record repeats it.
+        'process_max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'status': result.status_name, 'objective': result.objective,
+    }
+
+
+def case_key(record):
+    return tuple(record[field] for field in ('engine', 'kind', 'workers', 'days', 'shifts', 'coverage',
+                                             'density', 'seed'))
+
+
+def run_suite(engines=engines, sizes=(8, 100, 1000), kinds=kinds, num_days=7, num_shifts=2, staffing=0.5,
+              density=0.3, seeds=(0,), max_time_in_seconds=60, out=None, measure_memory=True):
+    # Runs every combination and yields its record; with out, each record is also
+    # appended to that file as one JSON line, so partial runs are kept.
+    meta = {'python': platform.python_version(), 'ortools': ortools_version, 'time': time.time()}
+    for workers in sizes:
+        for kind in kinds:
+            for seed in seeds:
+                for engine in engines:
+                    record = run_case(engine, workers, num_days, num_shifts, staffing, density, kind, seed,
+                                      max_time_in_seconds, measure_memory)
+                    record.update(meta)
+                    if out is not None:
+                        with open(out, 'a') as f:
+                            f.write(json.dumps(record) + '\n')
+                    yield record
+
+
+def load_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(results, baseline, threshold=0.2, min_seconds=0.01):
+    # Returns a (record, baseline record, field) for every case that got slower than
+    # the baseline by more than threshold, or changed status. Times under min_seconds
+    # in both runs are noise and are never flagged. process_max_rss_mb is not a per-case
+    # number and is never compared.
+    base = {case_key(record): record for record in baseline}
+    regressions = []
+    for record in results:
+        old = base.get(case_key(record))
+        if old is None:
+            continue
+        if record['status'] != old['status']:
+            regressions.append((record, old, 'status'))
+        for field in ('build_seconds', 'solve_seconds'):
+            if max(record[field], old[field]) >= min_seconds and record[field] > old[field] * (1 + threshold):
+                regressions.append((record, old, field))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the shift scheduling engines.')
+    parser.add_argument('--engines', default=','.join(engines))
+    parser.add_argument('--sizes', default='8,100,1000')
+    parser.add_argument('--kinds', default=','.join(kinds))
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--shifts', type=int, default=2)
+    parser.add_argument('--staffing', type=float, default=0.5)
+    parser.add_argument('--density', type=float, default=0.3)
+    parser.add_argument('--seeds', default='0')
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--out', help='append results to this JSON-lines file')
+    parser.add_argument('--baseline', help='JSON-lines results to check for regressions against')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run for peak memory')
+    args = parser.parse_args(argv)
+
+    results = []
+    for record in run_suite(args.engines.split(','), [int(size) for size in args.sizes.split(',')],
+                            args.kinds.split(','), args.days, args.shifts, args.staffing, args.density,
+                            [int(seed) for seed in args.seeds.split(',')], args.time_limit, args.out,
+                            not args.no_memory):
+        results.append(record)
+        print('%-8s %-10s %6i workers  build %8.3fs  solve %8.3fs  peak %7.1fMB  %-10s %s' % (
+            record['engine'], record['kind'], record['workers'], record['build_seconds'],
+            record['solve_seconds'], record['peak_python_mb'] or 0, record['status'], record['objective']))
+
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.threshold)
+        for record, old, field in regressions:
+            print('REGRESSION %s %s %i workers: %s %s -> %s' % (record['engine'], record['kind'],
+                                                               record['workers'], field, old[field],
+                                                               record[field]))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
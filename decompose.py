@@ -0,0 +1,183 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from flow import check_engine, solve_flow
+from scheduler import (ScheduleResult, as_preference_matrix, build_model, coverage_matrix, default_coverage,
+                       default_min_shifts, make_solver, solve_schedule)
+
+
+class ShardReport:
+    def __init__(self, group, workers, status, objective, seconds):
+        self.group = group
+        # workers: indices of the shard's workers in the full preference matrix.
+        self.workers = workers
+        self.status = status
+        self.objective = objective
+        self.seconds = seconds
+
+
+class DecomposedResult(ScheduleResult):
+    def __init__(self, status, objective, assignment, preferences, names, shards, reconcile_seconds,
+                 bound=None, fallback=False):
+        ScheduleResult.__init__(self, status, objective, assignment, preferences, names)
+        self.shards = shards
+        self.reconcile_seconds = reconcile_seconds
+        # bound: the monolithic optimum (flow) or CP-SAT's best bound for it, when compared.
+        self.bound = bound
+        # fallback: the shards could not be stitched and the monolithic model was solved.
+        self.fallback = fallback
+
+    @property
+    def gap(self):
+        if self.bound is None or self.objective is None:
+            return None
+        return (self.objective - self.bound) / max(self.objective, 1)
+
+
+def solve_part(engine, preferences, coverage, min_shifts, max_time_in_seconds):
+    # Runs in a pool process, so it returns plain values instead of a ScheduleResult.
+    start = time.perf_counter()
+    if check_engine(engine) == 'flow':
+        result = solve_flow(preferences, coverage=coverage, min_shifts=min_shifts)
+    else:
+        result = solve_schedule(preferences, coverage=coverage, min_shifts=min_shifts,
+                                max_time_in_seconds=max_time_in_seconds, num_search_workers=1)
+    return int(result.status), result.objective, result.assignment, time.perf_counter() - start
+
+
+def split_coverage(coverage, sizes):
+    # Splits the coverage of every (day, shift) between shards in proportion to their
+    # size, handing the remainder to the shards with the largest fractional share.
+    sizes = np.asarray(sizes)
+    shares = coverage[..., None] * sizes / sizes.sum()
+    quotas = np.floor(shares).astype(np.int64)
+    remainder = coverage - quotas.sum(axis=-1)
+    order = np.argsort(quotas - shares, axis=-1, kind='stable')
+    for (d, s), extra in np.ndenumerate(remainder):
+        quotas[d, s, order[d, s, :extra]] += 1
+    return quotas
+
+
+def boundary_workers(preferences, assignment, free, min_shifts):
+    # The workers a reconciliation pass re-solves together: everyone already marked
+    # free (their shard was infeasible), everyone paying for an undesired shift, and
+    # the workers who can hand them shifts: for every undesired shift one worker who
+    # can take that slot at no cost, and for every free worker up to min_shifts of the
+    # busiest workers holding slots it would take.
+    boundary = free.copy()
+    costly = assignment & (preferences > 0)
+    boundary |= costly.any(axis=(1, 2))
+    load = assignment.sum(axis=(1, 2))
+    candidates = ~assignment & (preferences == 0) & ~boundary[:, None, None]
+    for (d, s), need in np.ndenumerate(costly.sum(axis=0)):
+        if need:
+            spare = np.flatnonzero(candidates[:, d, s])
+            boundary[spare[np.argsort(load[spare], kind='stable')[:need]]] = True
+    for n in np.flatnonzero(free):
+        wanted = preferences[n] == 0
+        holders = np.flatnonzero((assignment & wanted).any(axis=(1, 2)) & ~boundary & (load > min_shifts))
+        boundary[holders[np.argsort(-load[holders], kind='stable')[:min_shifts]]] = True
+    return boundary
+
+
+def monolithic_bound(preferences, coverage, min_shifts, engine, max_time_in_seconds):
+    if engine == 'flow':
+        return solve_flow(preferences, coverage=coverage, min_shifts=min_shifts).objective
+    schedule = build_model(preferences, coverage=coverage, min_shifts=min_shifts)
+    solver = make_solver(max_time_in_seconds)
+    if solver.Solve(schedule.model) in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return int(np.ceil(solver.BestObjectiveBound()))
+    return None
+
+
+def solve_sharded(preferences, groups, num_days=None, num_shifts=None, coverage=default_coverage,
+                  min_shifts=default_min_shifts, names=None, engine='flow', max_processes=None,
+                  max_time_in_seconds=None, passes=2, compare=True):
+    # groups[n]: the team / site / skill label of worker 'n'. Coverage is shared by the
+    # whole organization; a dict {group: coverage} instead gives every shard its own
+    # coverage, which makes the shards independent.
+    check_engine(engine)
+    prefs = as_preference_matrix(preferences, num_days, num_shifts)
+    num_workers, num_days, num_shifts = prefs.shape
+    groups = np.asarray(groups)
+    labels = list(dict.fromkeys(groups.tolist()))
+    members = [np.flatnonzero(groups == label) for label in labels]
+
+    if isinstance(coverage, dict):
+        quotas = np.stack([coverage_matrix(coverage[label], num_days, num_shifts) for label in labels], axis=-1)
+        coupled = False
+    else:
+        quotas = split_coverage(coverage_matrix(coverage, num_days, num_shifts), [len(m) for m in members])
+        coupled = True
+    total_coverage = quotas.sum(axis=-1)
+
+    jobs = [(engine, prefs[workers], quotas[..., idx], min_shifts, max_time_in_seconds)
+            for idx, workers in enumerate(members)]
+    if max_processes == 1:
+        parts = [solve_part(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_processes) as pool:
+            parts = list(pool.map(solve_part, *zip(*jobs)))
+
+    assignment = np.zeros(prefs.shape, dtype=bool)
+    free = np.zeros(num_workers, dtype=bool)
+    shards = []
+    for label, workers, (status, objective, part, seconds) in zip(labels, members, parts):
+        shards.append(ShardReport(label, workers, status, objective, seconds))
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            assignment[workers] = part
+        else:
+            free[workers] = True
+
+    # Reconciliation: re-solve the boundary workers against the coverage the fixed
+    # workers leave open. Their current shifts are a feasible answer, so a pass never
+    # makes the roster worse.
+    start = time.perf_counter()
+    fallback = False
+    if coupled:
+        for _ in range(passes):
+            boundary = boundary_workers(prefs, assignment, free, min_shifts)
+            if not boundary.any():
+                break
+            open_coverage = total_coverage - assignment[~boundary].sum(axis=0)
+            status, _, part, _ = solve_part(engine, prefs[boundary], open_coverage, min_shifts,
+                                            max_time_in_seconds)
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                break
+            before = (assignment * prefs).sum()
+            assignment[boundary] = part
+            improved = free.any() or (assignment * prefs).sum() < before
+            free[:] = False
+            if not improved:
+                break
+        if free.any():
+            # A shard stayed infeasible and reconciliation could not absorb it.
+            fallback = True
+            status, _, assignment, _ = solve_part(engine, prefs, total_coverage, min_shifts,
+                                                  max_time_in_seconds)
+            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                free[:] = False
+    reconcile_seconds = time.perf_counter() - start
+
+    bound = None
+    if free.any():
+        status, objective = cp_model.INFEASIBLE, None
+        assignment = np.zeros(prefs.shape, dtype=bool)
+    else:
+        objective = int((assignment * prefs).sum())
+        if not coupled:
+            # Independent shards: the roster is optimal when every shard is.
+            optimal = all(shard.status == cp_model.OPTIMAL for shard in shards)
+        elif compare:
+            bound = monolithic_bound(prefs, total_coverage, min_shifts, engine, max_time_in_seconds)
+            optimal = objective == bound
+        else:
+            # Splitting shared coverage restricts the problem, so optimal shards prove
+            # nothing about the whole roster without the monolithic bound.
+            optimal = False
+        status = cp_model.OPTIMAL if optimal else cp_model.FEASIBLE
+    return DecomposedResult(status, objective, assignment, prefs, names, shards, reconcile_seconds,
+                            bound, fallback)
@@ -0,0 +1,141 @@
+import numpy as np
+from ortools.graph.python import min_cost_flow
+from ortools.sat.python import cp_model
+
+from scheduler import (ScheduleResult, as_preference_matrix, coverage_matrix, default_coverage,
+                       default_min_shifts, make_solver, run_solver)
+from telemetry import SolveReport, emit
+
+# The engines a caller can pick by name (decompose.py, scenarios.py).
+solver_engines = ['flow', 'cp-sat']
+
+
+def check_engine(engine):
+    if engine not in solver_engines:
+        raise ValueError('unknown engine %r, expected one of %s' % (engine, ', '.join(solver_engines)))
+    return engine
+
+
+# The roster model is a transportation problem: every worker sends shifts to the
+# (day, shift) slots, each slot takes exactly its coverage, and each worker sends at
+# least min_shifts. The network is
+#
+#   source -> worker n          capacity days*shifts - lower[n], cost 0
+#   worker n -> slot (d, s)     capacity 1 (0 if not allowed), cost preferences[n, d, s]
+#   slot (d, s) -> sink         capacity coverage[d, s], cost 0
+#
+# and the lower bound on each worker arc is moved into the node supplies (worker n
+# supplies lower[n], the source supplies the rest), so a plain min-cost flow solves it.
+def min_cost_roster(costs, coverage, lower, allowed=None, report=None):
+    if report is None:
+        report = SolveReport('flow')
+    num_workers, num_days, num_shifts = costs.shape
+    num_slots = num_days * num_shifts
+    total = int(coverage.sum())
+    lower = np.broadcast_to(np.asarray(lower, dtype=np.int64), (num_workers,))
+    if allowed is None:
+        allowed = np.ones(costs.shape, dtype=bool)
+    empty = np.zeros(costs.shape, dtype=bool)
+    if (lower > num_slots).any() or lower.sum() > total:
+        return cp_model.INFEASIBLE, None, empty
+
+    source = 0
+    workers = np.arange(1, num_workers + 1)
+    slots = np.arange(num_workers + 1, num_workers + num_slots + 1)
+    sink = num_workers + num_slots + 1
+
+    with report.phase('network'):
+        flow = min_cost_flow.SimpleMinCostFlow()
+        flow.add_arcs_with_capacity_and_unit_cost(np.full(num_workers, source), workers,
+                                                  num_slots - lower, np.zeros(num_workers, dtype=np.int64))
+        first = flow.add_arcs_with_capacity_and_unit_cost(np.repeat(workers, num_slots),
+                                                          np.tile(slots, num_workers),
+                                                          allowed.reshape(-1).astype(np.int64),
+                                                          costs.reshape(-1).astype(np.int64))[0]
+        flow.add_arcs_with_capacity_and_unit_cost(slots, np.full(num_slots, sink),
+                                                  coverage.reshape(-1).astype(np.int64),
+                                                  np.zeros(num_slots, dtype=np.int64))
+        flow.set_nodes_supplies(np.concatenate([[source], workers, [sink]]),
+                                np.concatenate([[total - lower.sum()], lower, [-total]]))
+
+    with report.phase('solve'):
+        status = flow.solve()
+    if status == flow.INFEASIBLE:
+        return cp_model.INFEASIBLE, None, empty
+    if status != flow.OPTIMAL:
+        # BAD_COST_RANGE (costs too large, e.g. heavy fairness weights), BAD_RESULT and
+        # the like say nothing about the roster, so they are not reported as infeasible.
+        return cp_model.MODEL_INVALID, None, empty
+    with report.phase('extract'):
+        assignment = flow.flows(np.arange(first, first + costs.size)).reshape(costs.shape) != 0
+    return cp_model.OPTIMAL, int(flow.optimal_cost()), assignment
+
+
+def solve_flow(preferences, num_days=None, num_shifts=None, coverage=default_coverage,
+               min_shifts=default_min_shifts, names=None, sinks=None, report=None):
+    # Same instance and result as scheduler.solve_schedule, solved in polynomial time.
+    # A report passed in (e.g. one that already timed reading the preferences) is
+    # continued instead of starting a new one.
+    if report is None:
+        report = SolveReport('flow')
+    with report.phase('preferences'):
+        prefs = as_preference_matrix(preferences, num_days, num_shifts)
+    status, objective, assignment = min_cost_roster(prefs, coverage_matrix(coverage, *prefs.shape[1:]),
+                                                    min_shifts, report=report)
+    return flow_result(report, status, objective, assignment, prefs, names, sinks)
+
+
+def flow_result(report, status, objective, assignment, preferences, names, sinks):
+    result = ScheduleResult(status, objective, assignment, preferences, names)
+    report.record_result(result)
+    result.report = report
+    emit(report, sinks)
+    return result
+
+
+def flow_instance(schedule):
+    # Returns (costs, coverage, lower, allowed) when the model still only holds the
+    # variables and constraints ScheduleModel created (coverage equalities and minimum
+    # shifts, possibly patched by a session), or None when anything richer was added.
+    # Coverage and minimum shifts come from the model's own bookkeeping and the costs
+    # from the objective proto, so the check does not walk the proto in Python.
+    proto = schedule.model.Proto()
+    if proto.has_floating_point_objective() or len(proto.assumptions):
+        return None
+    if len(proto.variables) != schedule.own_variables or len(proto.constraints) != schedule.own_constraints:
+        return None
+    shape = schedule.shifts.shape
+
+    costs = np.zeros(shape, dtype=np.int64)
+    objective = proto.objective
+    if proto.has_objective():
+        if objective.offset or len(objective.domain) or objective.scaling_factor not in (0, 1):
+            return None
+        variables = np.array(objective.vars, dtype=np.int64)
+        coeffs = np.array(objective.coeffs, dtype=np.int64)
+        if (coeffs < 0).any():
+            return None
+        # cell[var]: flat (n, d, s) position of a shift variable, -1 for the variables of
+        # removed workers, which are fixed to 0 and cost nothing.
+        cell = np.full(len(proto.variables), -1, dtype=np.int64)
+        cell[schedule.indices.ravel()] = np.arange(schedule.indices.size)
+        cells = cell[variables]
+        np.add.at(costs.reshape(-1), cells[cells >= 0], coeffs[cells >= 0])
+    lower = np.full(shape[0], schedule.min_shifts, dtype=np.int64)
+    return costs, np.array(schedule.coverage), lower, np.ones(shape, dtype=bool)
+
+
+def solve_model(schedule, names=None, max_time_in_seconds=None, num_search_workers=0, sinks=None):
+    # Solves a ScheduleModel with min-cost flow when it only holds flow constraints and
+    # falls back to CP-SAT otherwise; both return a ScheduleResult.
+    report = schedule.report
+    with report.phase('detect'):
+        instance = flow_instance(schedule)
+    if instance is None:
+        result = run_solver(schedule, make_solver(max_time_in_seconds, num_search_workers), names)
+        emit(report, sinks)
+        return result
+    report.engine = 'flow'
+    costs, coverage, lower, allowed = instance
+    status, objective, assignment = min_cost_roster(costs, coverage, lower, allowed, report)
+    return flow_result(report, status, objective, assignment, schedule.preferences, names, sinks)
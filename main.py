@@ -1,65 +1,42 @@
-from ortools.sat.python import cp_model
+import sys
 from tkinter import *
 from itertools import islice
 
+from flow import solve_flow
+from preferences import load_preferences
+from telemetry import SolveReport
+
 num_workers = 8
 num_shifts = 2
 num_days = 7
 min_shifts_per_weak = 2
+coverage = 4
 
 
 def calculate_shifts(workers):
-    shift_requests = []
-    for worker in workers:
-        shift_requests.append(worker.get_shifts_array())
-
     # This program tries to find an assignment of workers to shifts
     # (2 shifts per day, for 7 days), subject to some constraints.
     # Each worker can request to be assigned to specific shifts.
-    all_shifts = range(num_shifts)
-    all_days = range(num_days)
-    # Creates the model.
-    model = cp_model.CpModel()
-
-    # Creates shift variables.
-    # shifts[(n, d, s)]: worker 'n' works shift 's' on day 'd'.
-    shifts = {}
-    for idx, n in enumerate(workers):
-        for d in all_days:
-            for s in all_shifts:
-                shifts[(idx, d,
-                        s)] = model.NewBoolVar('shift_n%id%is%i' % (idx, d, s))
-
-    for d in all_days:
-        for s in all_shifts:
-            model.Add(sum(shifts[(idx, d, s)] for idx, n in enumerate(workers)) == 4)
-
-    for idx, worker in enumerate(workers):
-        model.Add(sum(shifts[(idx, d, s)] for d in all_days for s in all_shifts) >= min_shifts_per_weak)
-    model.Minimize(
-        sum(shift_requests[idx][d][s] * shifts[(idx, d, s)] for idx, n in enumerate(workers)
-            for d in all_days for s in all_shifts))
-    # Creates the solver and solve.
-    solver = cp_model.CpSolver()
-    status = solver.Solve(model)
+    report = SolveReport('flow')
+    with report.phase('preferences'):
+        shift_requests = [worker.get_shifts_array() for worker in workers]
+    return print_shifts(shift_requests, [worker.name for worker in workers], report)
+
+
+def print_shifts(shift_requests, names, report=None):
+    # The roster model is a plain flow model, so it is solved without building it for CP-SAT.
+    result = solve_flow(shift_requests, num_days, num_shifts, coverage, min_shifts_per_weak, names,
+                        report=report)
 
     # print
-    if status != 3:
-        for d in all_days:
-            print('Day', d + 1)
-            for idx, w in enumerate(workers):
-                for s in all_shifts:
-                    if solver.Value(shifts[(idx, d, s)]) == 1:
-                        if shift_requests[idx][d][s] == 1:
-                            print(w.name, 'works shift', s, '(not want to work).')
-                        else:
-                            print(w.name, 'works shift', s)
-    else:
-        print("there is no solution!")
+    result.print_schedule()
     print()
     print('Statistics')
-    print('  - Number of shift that worker not want but get = %i' % solver.ObjectiveValue(),
-          '(out of', num_shifts * num_days * 4, ')')
+    print('  - Status:', result.status_name)
+    if result.feasible:
+        print('  - Number of shift that worker not want but get = %i' % result.objective,
+              '(out of', num_shifts * num_days * coverage, ')')
+    return result
 
 
 class CheckBar(Frame):
@@ -132,6 +109,13 @@ def view():
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # python main.py preferences.csv|.jsonl|.bin: load every worker at once instead
+        # of asking each one in a window.
+        store = load_preferences(sys.argv[1], num_days, num_shifts)
+        print_shifts(store, store.names)
+        sys.exit()
+
     workers = []
     for i in range(num_workers):
         worker = view()
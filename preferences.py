@@ -0,0 +1,154 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+# Binary store layout: magic, then num_days, num_shifts and num_workers as little-endian
+# uint32, then one row of packed bits per worker. Names, if any, go to <path>.names.
+magic = b'SHFT'
+header_size = 16
+
+
+class PreferenceStore:
+    # Keeps every worker's refusals as a packed bitset over days x shifts: bit
+    # d * num_shifts + s of row n is set when worker 'n' does not want shift 's' on day
+    # 'd', the same order Worker.get_shifts_array() reads the check bar in.
+    def __init__(self, bits, num_days, num_shifts, names=None):
+        self.bits = bits
+        self.num_days = num_days
+        self.num_shifts = num_shifts
+        if names is None:
+            names = ['worker %i' % idx for idx in range(len(bits))]
+        self.names = list(names)
+
+    @classmethod
+    def from_matrix(cls, preferences, names=None):
+        prefs = np.asarray(preferences)
+        num_workers, num_days, num_shifts = prefs.shape
+        return cls(np.packbits(prefs.reshape(num_workers, -1) != 0, axis=1), num_days, num_shifts, names)
+
+    def __len__(self):
+        return len(self.bits)
+
+    @property
+    def shape(self):
+        return len(self.bits), self.num_days, self.num_shifts
+
+    def to_matrix(self):
+        cells = self.num_days * self.num_shifts
+        return np.unpackbits(self.bits, axis=1, count=cells).reshape(self.shape)
+
+    def __array__(self, dtype=None, copy=None):
+        # Lets every solver take the store wherever it takes a preference matrix.
+        matrix = self.to_matrix()
+        return matrix if dtype is None else matrix.astype(dtype)
+
+    def refuses(self, d, s):
+        # refuses(d, s)[n]: worker 'n' does not want shift 's' on day 'd'.
+        bit = d * self.num_shifts + s
+        return (self.bits[:, bit // 8] >> (7 - bit % 8)) & 1 != 0
+
+    def available(self, d, s):
+        return ~self.refuses(d, s)
+
+    def available_names(self, d, s):
+        return [self.names[idx] for idx in np.flatnonzero(self.available(d, s))]
+
+    def available_counts(self):
+        # available_counts()[d, s]: how many workers can take shift 's' on day 'd'.
+        return len(self) - self.to_matrix().sum(axis=0, dtype=np.int64)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(magic)
+            f.write(np.array([self.num_days, self.num_shifts, len(self)], dtype='<u4').tobytes())
+            f.write(np.ascontiguousarray(self.bits).tobytes())
+        with open(path + '.names', 'w', encoding='utf-8') as f:
+            f.writelines(name + '\n' for name in self.names)
+
+
+def load_binary(path, mmap=True):
+    # With mmap the bits stay on disk and are paged in as queries touch them.
+    with open(path, 'rb') as f:
+        header = f.read(header_size)
+    if header[:4] != magic:
+        raise ValueError('%s is not a preference store' % path)
+    num_days, num_shifts, num_workers = np.frombuffer(header[4:], dtype='<u4')
+    row_bytes = (int(num_days) * int(num_shifts) + 7) // 8
+    shape = (int(num_workers), row_bytes)
+    if mmap:
+        bits = np.memmap(path, dtype=np.uint8, mode='r', offset=header_size, shape=shape)
+    else:
+        bits = np.fromfile(path, dtype=np.uint8, offset=header_size).reshape(shape)
+    names = None
+    if os.path.exists(path + '.names'):
+        with open(path + '.names', encoding='utf-8') as f:
+            names = f.read().splitlines()
+    return PreferenceStore(bits, int(num_days), int(num_shifts), names)
+
+
+def load_csv(path, num_days, num_shifts):
+    # One row per worker: the name, then days * shifts 0/1 cells. A header row, if any,
+    # is skipped. Every row must hold exactly one single-character cell per (day, shift),
+    # so a short row cannot shift the cells of the rows after it; the cells of all rows
+    # are then converted and checked for 0/1 in one go.
+    width = num_days * num_shifts
+    names, cells, lines = [], [], []
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        for row in reader:
+            if len(row) < 2 or (not names and not row[1].strip().isdigit()):
+                continue
+            stripped = [cell.strip() for cell in row[1:]]
+            row_cells = ''.join(stripped)
+            if len(stripped) != width or len(row_cells) != width or '' in stripped:
+                raise ValueError('line %i: expected %i cells of 0 or 1 for %r, got %s'
+                                 % (reader.line_num, width, row[0], ','.join(row[1:])))
+            names.append(row[0])
+            cells.append(row_cells)
+            lines.append(reader.line_num)
+    try:
+        return from_cells(''.join(cells), names, num_days, num_shifts)
+    except ValueError:
+        # Some cell is not 0 or 1; report the first row holding one.
+        for name, row_cells, line in zip(names, cells, lines):
+            if not set(row_cells) <= {'0', '1'}:
+                raise ValueError('line %i: expected %i cells of 0 or 1 for %r, got %s'
+                                 % (line, width, name, ','.join(row_cells))) from None
+        raise
+
+
+def load_jsonl(path, num_days, num_shifts):
+    # One object per line: {"name": ..., "shifts": [0/1 for every cell]} or
+    # {"name": ..., "refuse": [[day, shift], ...]}.
+    names, cells, refusals = [], [], []
+    empty = [0] * (num_days * num_shifts)
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            names.append(record.get('name', 'worker %i' % len(names)))
+            cells.append(record.get('shifts', empty))
+            refusals.extend((len(names) - 1, d, s) for d, s in record.get('refuse', ()))
+    prefs = np.array(cells, dtype=np.uint8).reshape(len(names), num_days, num_shifts)
+    if refusals:
+        prefs[tuple(np.array(refusals).T)] = 1
+    return PreferenceStore.from_matrix(prefs, names)
+
+
+def from_cells(cells, names, num_days, num_shifts):
+    prefs = np.frombuffer(cells.encode('ascii'), dtype=np.uint8) - ord('0')
+    if len(prefs) != len(names) * num_days * num_shifts or (prefs > 1).any():
+        raise ValueError('every worker needs %i cells of 0 or 1' % (num_days * num_shifts))
+    return PreferenceStore.from_matrix(prefs.reshape(len(names), num_days, num_shifts), names)
+
+
+def load_preferences(path, num_days=None, num_shifts=None):
+    # Picks the loader by extension; .csv and .jsonl need the week shape.
+    if path.endswith('.csv'):
+        return load_csv(path, num_days, num_shifts)
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return load_jsonl(path, num_days, num_shifts)
+    return load_binary(path)
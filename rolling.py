@@ -0,0 +1,132 @@
+import numpy as np
+from ortools.sat.python import cp_model
+
+from flow import solve_flow, solve_model
+from scheduler import ScheduleResult, build_model, coverage_matrix, default_coverage, default_min_shifts
+
+default_window = 7
+
+
+class CarryOver:
+    # State handed from one window to the next.
+    def __init__(self, num_workers):
+        # undesired[n]: undesired shifts worker 'n' got in all previous windows.
+        self.undesired = np.zeros(num_workers, dtype=np.int64)
+        # worked[n]: shifts worker 'n' worked in all previous windows.
+        self.worked = np.zeros(num_workers, dtype=np.int64)
+        # last_shift[n]: shift worker 'n' worked on the previous window's last day, or -1.
+        self.last_shift = np.full(num_workers, -1, dtype=np.int64)
+
+    def copy(self):
+        carry = CarryOver(len(self.undesired))
+        carry.undesired = self.undesired.copy()
+        carry.worked = self.worked.copy()
+        carry.last_shift = self.last_shift.copy()
+        return carry
+
+    def update(self, result):
+        self.undesired += result.undesired_per_worker()
+        self.worked += result.shifts_per_worker()
+        last_day = result.assignment[:, -1, ::-1]
+        self.last_shift = np.where(last_day.any(axis=1), last_day.shape[1] - 1 - np.argmax(last_day, axis=1), -1)
+
+
+class WindowResult(ScheduleResult):
+    def __init__(self, result, start_day, carry):
+        ScheduleResult.__init__(self, result.status, result.objective, result.assignment, result.preferences,
+                                result.names)
+        self.start_day = start_day
+        # carry: the state after this window, i.e. the one the next window starts from.
+        self.carry = carry
+
+
+def add_rest_rule(schedule, last_shift):
+    # Nobody works the first shift of a day right after the last shift of the day
+    # before, including across the boundary with the previous window.
+    num_workers, num_days, num_shifts = schedule.shifts.shape
+    model = schedule.model
+    for n in range(num_workers):
+        for d in range(num_days - 1):
+            model.Add(schedule.shifts[n, d, num_shifts - 1] + schedule.shifts[n, d + 1, 0] <= 1)
+    for n in np.flatnonzero(last_shift == num_shifts - 1):
+        model.Add(schedule.shifts[n, 0, 0] == 0)
+
+
+def solve_window(preferences, carry, coverage=default_coverage, min_shifts=default_min_shifts, rest=False,
+                 fairness=1, names=None, max_time_in_seconds=None, num_search_workers=0):
+    # Undesired shifts cost more for workers who already got many of them, so they are
+    # spread over the horizon instead of landing on the same people every week.
+    costs = preferences * (1 + fairness * carry.undesired)[:, None, None]
+    if rest:
+        schedule = build_model(costs, coverage=coverage, min_shifts=min_shifts)
+        add_rest_rule(schedule, carry.last_shift)
+        result = solve_model(schedule, names, max_time_in_seconds, num_search_workers)
+    else:
+        # Without the rest rule a window is a plain flow model; skip building it for CP-SAT.
+        result = solve_flow(costs, coverage=coverage, min_shifts=min_shifts, names=names)
+    objective = None
+    if result.feasible:
+        objective = int((result.assignment * preferences).sum())
+    return ScheduleResult(result.status, objective, result.assignment, preferences, names)
+
+
+def windows(preferences, window):
+    # Accepts the whole horizon as one (workers x days x shifts) array, sliced into
+    # windows, or any iterable of per-window arrays so the horizon never has to be in
+    # memory at once.
+    if isinstance(preferences, np.ndarray) and preferences.ndim == 3:
+        for start in range(0, preferences.shape[1], window):
+            yield preferences[:, start:start + window]
+    else:
+        yield from preferences
+
+
+def iter_windows(preferences, window=default_window, coverage=default_coverage, min_shifts=default_min_shifts,
+                 rest=False, fairness=1, names=None, carry=None, max_time_in_seconds=None, num_search_workers=0):
+    # Solves the horizon one window at a time and yields a WindowResult per window as
+    # soon as it is solved. coverage is a number, a (days x shifts) array for the whole
+    # horizon, or a callable (start_day, days, shifts) -> coverage of one window.
+    # Stops after the first infeasible window, since later windows depend on it.
+    start_day = 0
+    for window_prefs in windows(preferences, window):
+        window_prefs = np.asarray(window_prefs, dtype=np.int64)
+        num_days, num_shifts = window_prefs.shape[1:]
+        if carry is None:
+            carry = CarryOver(len(window_prefs))
+        if callable(coverage):
+            window_coverage = coverage(start_day, num_days, num_shifts)
+        elif np.ndim(coverage) == 2:
+            window_coverage = np.asarray(coverage)[start_day:start_day + num_days]
+        else:
+            window_coverage = coverage_matrix(coverage, num_days, num_shifts)
+        # min_shifts is per full window; a shorter last window asks for a share of it.
+        window_min_shifts = min_shifts * num_days // window
+        result = solve_window(window_prefs, carry, window_coverage, window_min_shifts, rest, fairness, names,
+                              max_time_in_seconds, num_search_workers)
+        if result.feasible:
+            carry = carry.copy()
+            carry.update(result)
+        yield WindowResult(result, start_day, carry)
+        if not result.feasible:
+            return
+        start_day += num_days
+
+
+def solve_horizon(preferences, window=default_window, coverage=default_coverage, min_shifts=default_min_shifts,
+                  rest=False, fairness=1, names=None, max_time_in_seconds=None, num_search_workers=0):
+    # Stitches the windows of iter_windows into one result over the whole horizon. Each
+    # window is solved to optimality on its own, so the horizon is only reported OPTIMAL
+    # when it fits in one window.
+    prefs = np.asarray(preferences, dtype=np.int64)
+    assignment = np.zeros(prefs.shape, dtype=bool)
+    status = cp_model.OPTIMAL if prefs.shape[1] <= window else cp_model.FEASIBLE
+    objective = 0
+    for result in iter_windows(prefs, window, coverage, min_shifts, rest, fairness, names,
+                               max_time_in_seconds=max_time_in_seconds, num_search_workers=num_search_workers):
+        if not result.feasible:
+            return ScheduleResult(result.status, None, np.zeros(prefs.shape, dtype=bool), prefs, names)
+        assignment[:, result.start_day:result.start_day + result.assignment.shape[1]] = result.assignment
+        objective += result.objective
+        if not result.optimal:
+            status = cp_model.FEASIBLE
+    return ScheduleResult(status, objective, assignment, prefs, names)
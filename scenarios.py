@@ -0,0 +1,123 @@
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from flow import check_engine, solve_flow
+from scheduler import as_preference_matrix, coverage_matrix, default_coverage, default_min_shifts, solve_schedule
+
+# The base preference matrix of the running batch. Pool processes get it once through
+# their initializer, so each scenario only ships its parameters.
+base_preferences = None
+
+
+def set_base(preferences):
+    global base_preferences
+    base_preferences = preferences
+
+
+def variant(scenario, preferences, names, base):
+    # Resolves a scenario dict against the base parameters into (keep, days, coverage,
+    # min_shifts, engine). A scenario may set 'coverage', 'min_shifts', 'days' (solve
+    # only the first days of the week), 'exclude' (worker indices or names) and 'engine'.
+    params = dict(base, **scenario)
+    num_workers, num_days, num_shifts = preferences.shape
+    keep = np.ones(num_workers, dtype=bool)
+    for worker in params.get('exclude', ()):
+        keep[names.index(worker) if isinstance(worker, str) else worker] = False
+    days = params.get('days', num_days)
+    if not 1 <= days <= num_days:
+        raise ValueError('scenario %r: days must be between 1 and %i, got %r' % (scenario, num_days, days))
+    # A per-shift coverage for the whole week is cut to the days solved.
+    coverage = np.asarray(params.get('coverage', default_coverage), dtype=np.int64)
+    if coverage.ndim == 2 and len(coverage) == num_days:
+        coverage = coverage[:days]
+    try:
+        coverage = np.array(coverage_matrix(coverage, days, num_shifts))
+    except ValueError:
+        raise ValueError('scenario %r: coverage of shape %s does not fit %i days x %i shifts'
+                         % (scenario, coverage.shape, days, num_shifts)) from None
+    engine = check_engine(params.get('engine', 'flow'))
+    return keep, days, coverage, params.get('min_shifts', default_min_shifts), engine
+
+
+def instance_key(preferences, keep, days, coverage, min_shifts, engine, max_time_in_seconds):
+    # Two scenarios with the same key are the same instance, whatever they are called:
+    # the key hashes the preferences actually solved, not the scenario parameters.
+    prefs = np.ascontiguousarray(preferences[keep, :days])
+    digest = hashlib.sha256()
+    digest.update(np.asarray(prefs.shape).tobytes())
+    digest.update(prefs.tobytes())
+    digest.update(coverage.astype(np.int64).tobytes())
+    digest.update(repr((min_shifts, engine, max_time_in_seconds if engine != 'flow' else None)).encode())
+    return digest.hexdigest()
+
+
+def solve_variant(keep, days, coverage, min_shifts, engine, max_time_in_seconds):
+    start = time.perf_counter()
+    prefs = base_preferences[keep, :days]
+    if engine == 'flow':
+        result = solve_flow(prefs, coverage=coverage, min_shifts=min_shifts)
+    else:
+        result = solve_schedule(prefs, coverage=coverage, min_shifts=min_shifts,
+                                max_time_in_seconds=max_time_in_seconds, num_search_workers=1)
+    undesired = result.undesired_per_worker()
+    return {
+        'status': result.status_name, 'feasible': result.feasible, 'objective': result.objective,
+        'undesired': int(undesired.sum()) if result.feasible else None,
+        'max_undesired_per_worker': int(undesired.max(initial=0)) if result.feasible else None,
+        'workers': int(keep.sum()), 'solve_seconds': time.perf_counter() - start,
+    }
+
+
+def run_scenarios(preferences, scenarios, names=None, base=None, max_processes=None, cache=None,
+                  max_time_in_seconds=None):
+    # Solves every scenario (a dict of overrides of base, see variant) and returns one
+    # row per scenario in order. Identical instances are solved once; pass the same
+    # cache dict to later calls to reuse their results too.
+    prefs = as_preference_matrix(preferences)
+    if names is None:
+        names = ['worker %i' % idx for idx in range(len(prefs))]
+    if cache is None:
+        cache = {}
+    variants = [variant(scenario, prefs, names, base or {}) for scenario in scenarios]
+    keys = [instance_key(prefs, *params, max_time_in_seconds) for params in variants]
+
+    todo = {}
+    for key, params in zip(keys, variants):
+        if key not in cache and key not in todo:
+            todo[key] = params
+    jobs = [params + (max_time_in_seconds,) for params in todo.values()]
+    if max_processes == 1 or len(jobs) <= 1:
+        set_base(prefs)
+        try:
+            rows = [solve_variant(*job) for job in jobs]
+        finally:
+            set_base(None)
+    else:
+        with ProcessPoolExecutor(max_processes, initializer=set_base, initargs=(prefs,)) as pool:
+            rows = list(pool.map(solve_variant, *zip(*jobs)))
+    solved = set(todo)
+    cache.update(zip(todo, rows))
+
+    table = []
+    for idx, (scenario, key) in enumerate(zip(scenarios, keys)):
+        row = dict(cache[key], scenario=scenario.get('name', 'scenario %i' % idx), key=key[:12])
+        row['cached'] = key not in solved
+        solved.discard(key)
+        table.append(row)
+    return table
+
+
+def format_table(table):
+    columns = ['scenario', 'status', 'objective', 'undesired', 'max_undesired_per_worker', 'workers',
+               'solve_seconds', 'cached']
+    lines = [' | '.join(columns)]
+    for row in table:
+        cells = []
+        for column in columns:
+            value = row[column]
+            cells.append('%.3f' % value if isinstance(value, float) else str(value))
+        lines.append(' | '.join(cells))
+    return '\n'.join(lines)
@@ -0,0 +1,314 @@
+import queue
+import threading
+
+import numpy as np
+from ortools.sat import cp_model_pb2
+from ortools.sat.python import cp_model
+
+from telemetry import SolveReport, emit
+
+default_coverage = 4
+default_min_shifts = 2
+
+
+class ScheduleResult:
+    def __init__(self, status, objective, assignment, preferences, names=None):
+        self.status = status
+        self.status_name = cp_model_pb2.CpSolverStatus.Name(int(status))
+        self.objective = objective
+        # assignment[n, d, s] == 1: worker 'n' works shift 's' on day 'd'.
+        self.assignment = assignment
+        self.preferences = preferences
+        if names is None:
+            names = ['worker %i' % idx for idx in range(preferences.shape[0])]
+        self.names = list(names)
+        # report: the SolveReport of the solve that produced this result, if any.
+        self.report = None
+
+    @property
+    def feasible(self):
+        return self.status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+    @property
+    def optimal(self):
+        return self.status == cp_model.OPTIMAL
+
+    def undesired(self):
+        # undesired()[n, d, s] == 1: worker 'n' works shift 's' on day 'd' but asked not to.
+        return self.assignment & (self.preferences != 0)
+
+    def undesired_per_worker(self):
+        return self.undesired().sum(axis=(1, 2))
+
+    def shifts_per_worker(self):
+        return self.assignment.sum(axis=(1, 2))
+
+    def workers_on(self, d, s):
+        return [self.names[idx] for idx in np.flatnonzero(self.assignment[:, d, s])]
+
+    def print_schedule(self):
+        if self.status == cp_model.INFEASIBLE:
+            print("there is no solution!")
+            return
+        if not self.feasible:
+            print('no schedule found (%s)' % self.status_name)
+            return
+        num_workers, num_days, num_shifts = self.assignment.shape
+        for d in range(num_days):
+            print('Day', d + 1)
+            for idx in range(num_workers):
+                for s in range(num_shifts):
+                    if self.assignment[idx, d, s]:
+                        if self.preferences[idx, d, s]:
+                            print(self.names[idx], 'works shift', s, '(not want to work).')
+                        else:
+                            print(self.names[idx], 'works shift', s)
+
+
+def as_preference_matrix(preferences, num_days=None, num_shifts=None):
+    # Accepts any (workers x days x shifts) array-like, or a (workers x days*shifts) one
+    # that is reshaped with the given number of days and shifts.
+    prefs = np.asarray(preferences, dtype=np.int64)
+    if prefs.ndim == 2:
+        if num_shifts is None:
+            raise ValueError('num_shifts is required for a flat preference matrix')
+        if num_days is None:
+            num_days = prefs.shape[1] // num_shifts
+        prefs = prefs.reshape(prefs.shape[0], num_days, num_shifts)
+    if prefs.ndim != 3:
+        raise ValueError('preferences must have shape (workers, days, shifts), got %s' % (prefs.shape,))
+    if num_days is not None and prefs.shape[1] != num_days:
+        raise ValueError('preferences cover %i days, expected %i' % (prefs.shape[1], num_days))
+    if num_shifts is not None and prefs.shape[2] != num_shifts:
+        raise ValueError('preferences cover %i shifts, expected %i' % (prefs.shape[2], num_shifts))
+    if (prefs < 0).any():
+        raise ValueError('preferences must be non-negative')
+    return prefs
+
+
+def coverage_matrix(coverage, num_days, num_shifts):
+    # coverage may be a single number or a (days x shifts) array of required workers.
+    return np.broadcast_to(np.asarray(coverage, dtype=np.int64), (num_days, num_shifts))
+
+
+class ScheduleModel:
+    def __init__(self, preferences, coverage=default_coverage, min_shifts=default_min_shifts, report=None):
+        self.preferences = preferences.copy()
+        num_workers, num_days, num_shifts = preferences.shape
+        self.coverage = coverage_matrix(coverage, num_days, num_shifts)
+        self.min_shifts = min_shifts
+        self.model = cp_model.CpModel()
+        self.report = report if report is not None else SolveReport()
+
+        # Creates shift variables.
+        # shifts[n, d, s]: worker 'n' works shift 's' on day 'd'.
+        with self.report.phase('variables'):
+            self.shifts = np.array([self.model.NewBoolVar('shift_n%id%is%i' % (n, d, s))
+                                    for n in range(num_workers)
+                                    for d in range(num_days)
+                                    for s in range(num_shifts)],
+                                   dtype=object).reshape(num_workers, num_days, num_shifts)
+            # indices[n, d, s]: proto index of shifts[n, d, s], used to read a whole solution at once.
+            self.indices = np.array([var.Index() for var in self.shifts.ravel()],
+                                    dtype=np.int64).reshape(self.shifts.shape)
+
+        # Constraints and objective terms are kept by proto index so a session can patch
+        # them in place (see session.py); proto references must not be held across calls
+        # that grow the model.
+        with self.report.phase('constraints'):
+            self.coverage_constraints = np.zeros((num_days, num_shifts), dtype=np.int64)
+            for d in range(num_days):
+                for s in range(num_shifts):
+                    self.coverage_constraints[d, s] = self.model.Add(
+                        cp_model.LinearExpr.Sum(self.shifts[:, d, s].tolist()) == int(self.coverage[d, s])).Index()
+
+            self.min_shift_constraints = []
+            for n in range(num_workers):
+                self.min_shift_constraints.append(self.add_min_shifts(self.shifts[n]))
+
+        with self.report.phase('objective'):
+            self.set_objective()
+
+        # How many variables and constraints this class created itself. Anything added to
+        # self.model from outside makes the proto larger, which tells flow.flow_instance
+        # that the model is no longer a plain flow model.
+        self.own_variables = self.shifts.size
+        self.own_constraints = self.coverage_constraints.size + num_workers
+
+    def add_min_shifts(self, worker_shifts):
+        return self.model.Add(cp_model.LinearExpr.Sum(worker_shifts.ravel().tolist()) >= self.min_shifts).Index()
+
+    def set_objective(self):
+        # Only the shifts a worker does not want carry a cost, so the objective has one
+        # term per undesired cell rather than one per variable.
+        mask = self.preferences != 0
+        self.model.Minimize(cp_model.LinearExpr.WeightedSum(self.shifts[mask].tolist(),
+                                                            self.preferences[mask].tolist()))
+        # objective_terms[var index]: position of that variable in the objective proto.
+        self.objective_terms = {var: pos for pos, var in enumerate(self.model.Proto().objective.vars)}
+
+    def set_preference(self, n, d, s, value):
+        if value < 0:
+            raise ValueError('preferences must be non-negative')
+        self.preferences[n, d, s] = value
+        var = int(self.indices[n, d, s])
+        objective = self.model.Proto().objective
+        if var in self.objective_terms:
+            objective.coeffs[self.objective_terms[var]] = int(value)
+        elif value:
+            self.objective_terms[var] = len(objective.vars)
+            objective.vars.append(var)
+            objective.coeffs.append(int(value))
+
+    def set_coverage(self, d, s, value):
+        self.coverage = self.coverage.copy()
+        self.coverage[d, s] = value
+        linear = self.model.Proto().constraints[int(self.coverage_constraints[d, s])].linear
+        linear.domain[0] = int(value)
+        linear.domain[1] = int(value)
+
+    def add_worker(self, preferences):
+        # Adds the new worker's variables to the existing coverage constraints instead
+        # of rebuilding them.
+        n, num_days, num_shifts = self.shifts.shape
+        worker_shifts = np.array([self.model.NewBoolVar('shift_n%id%is%i' % (n, d, s))
+                                  for d in range(num_days) for s in range(num_shifts)],
+                                 dtype=object).reshape(1, num_days, num_shifts)
+        worker_indices = np.array([var.Index() for var in worker_shifts.ravel()],
+                                  dtype=np.int64).reshape(worker_shifts.shape)
+        self.shifts = np.concatenate([self.shifts, worker_shifts])
+        self.indices = np.concatenate([self.indices, worker_indices])
+        self.preferences = np.concatenate([self.preferences, np.zeros((1, num_days, num_shifts), dtype=np.int64)])
+        for d in range(num_days):
+            for s in range(num_shifts):
+                linear = self.model.Proto().constraints[int(self.coverage_constraints[d, s])].linear
+                linear.vars.append(int(self.indices[n, d, s]))
+                linear.coeffs.append(1)
+        self.min_shift_constraints.append(self.add_min_shifts(worker_shifts[0]))
+        self.own_variables += worker_shifts.size
+        self.own_constraints += 1
+        for (d, s), value in np.ndenumerate(preferences):
+            if value:
+                self.set_preference(n, d, s, value)
+        return n
+
+    def remove_worker(self, n):
+        # The worker's variables stay in the model fixed to 0 and their minimum-shift
+        # constraint is cleared; they are dropped from the arrays so indices shift down.
+        proto = self.model.Proto()
+        for var in self.indices[n].ravel():
+            domain = proto.variables[int(var)].domain
+            domain[1] = 0
+            if int(var) in self.objective_terms:
+                proto.objective.coeffs[self.objective_terms.pop(int(var))] = 0
+        proto.constraints[self.min_shift_constraints.pop(n)].clear_linear()
+        self.shifts = np.delete(self.shifts, n, axis=0)
+        self.indices = np.delete(self.indices, n, axis=0)
+        self.preferences = np.delete(self.preferences, n, axis=0)
+
+    def extract(self, values):
+        # values: the solution of every proto variable, as in CpSolverResponse.solution.
+        return np.asarray(list(values), dtype=np.int64)[self.indices] != 0
+
+
+def build_model(preferences, num_days=None, num_shifts=None, coverage=default_coverage,
+                min_shifts=default_min_shifts, report=None):
+    if report is None:
+        report = SolveReport()
+    with report.phase('preferences'):
+        prefs = as_preference_matrix(preferences, num_days, num_shifts)
+    return ScheduleModel(prefs, coverage, min_shifts, report)
+
+
+def make_solver(max_time_in_seconds=None, num_search_workers=0):
+    # num_search_workers == 0 lets CP-SAT run one search worker per core.
+    solver = cp_model.CpSolver()
+    if max_time_in_seconds is not None:
+        solver.parameters.max_time_in_seconds = max_time_in_seconds
+    solver.parameters.num_workers = num_search_workers
+    return solver
+
+
+def solve_schedule(preferences, num_days=None, num_shifts=None, coverage=default_coverage,
+                   min_shifts=default_min_shifts, names=None, max_time_in_seconds=None, num_search_workers=0,
+                   sinks=None):
+    # preferences[n][d][s] == 1: worker 'n' does not want to work shift 's' on day 'd'.
+    # With a time limit the result may be FEASIBLE (the best roster found so far) or UNKNOWN.
+    # Every sink gets the solve's SolveReport (see telemetry.py).
+    schedule = build_model(preferences, num_days, num_shifts, coverage, min_shifts)
+    result = run_solver(schedule, make_solver(max_time_in_seconds, num_search_workers), names)
+    emit(result.report, sinks)
+    return result
+
+
+class ImprovingSolutions(cp_model.CpSolverSolutionCallback):
+    def __init__(self, schedule, names, results):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.schedule = schedule
+        self.names = names
+        self.results = results
+
+    def on_solution_callback(self):
+        assignment = self.schedule.extract(self.response_proto.solution)
+        objective = int(round(self.ObjectiveValue()))
+        self.results.put(ScheduleResult(cp_model.FEASIBLE, objective, assignment,
+                                        self.schedule.preferences, self.names))
+
+
+def iter_schedules(preferences, num_days=None, num_shifts=None, coverage=default_coverage,
+                   min_shifts=default_min_shifts, names=None, max_time_in_seconds=None, num_search_workers=0,
+                   sinks=None):
+    # Yields a FEASIBLE ScheduleResult for every improving roster as soon as the solver
+    # finds it, then one last result carrying the final status. Closing the generator
+    # early stops the search. Sinks get the report once the search ends.
+    schedule = build_model(preferences, num_days, num_shifts, coverage, min_shifts)
+    solver = make_solver(max_time_in_seconds, num_search_workers)
+    results = queue.Queue()
+    callback = ImprovingSolutions(schedule, names, results)
+    done = object()
+
+    def search():
+        try:
+            result = run_solver(schedule, solver, names, callback)
+            emit(result.report, sinks)
+            results.put(result)
+        except Exception as error:
+            results.put(error)
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=search, daemon=True)
+    thread.start()
+    try:
+        while True:
+            result = results.get()
+            if result is done:
+                break
+            if isinstance(result, Exception):
+                raise result
+            yield result
+    finally:
+        solver.StopSearch()
+        thread.join()
+
+
+def run_solver(schedule, solver, names=None, callback=None):
+    with schedule.report.phase('solve'):
+        status = solver.Solve(schedule.model, callback)
+    return make_result(schedule, solver, status, names)
+
+
+def make_result(schedule, solver, status, names=None):
+    report = schedule.report
+    with report.phase('extract'):
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            assignment = schedule.extract(solver.ResponseProto().solution)
+            objective = int(round(solver.ObjectiveValue()))
+        else:
+            assignment = np.zeros(schedule.shifts.shape, dtype=bool)
+            objective = None
+        result = ScheduleResult(status, objective, assignment, schedule.preferences, names)
+    report.record_solver(solver)
+    report.record_result(result)
+    result.report = report
+    return result
@@ -0,0 +1,78 @@
+import numpy as np
+
+from scheduler import build_model, default_coverage, default_min_shifts, make_solver, run_solver
+from telemetry import SolveReport, emit
+
+
+class ScheduleSession:
+    # Keeps one model and the last roster between solves. Preference and staffing edits
+    # patch the model in place, and every solve is hinted with the previous roster so
+    # a small edit re-solves quickly and moves as few shifts as possible.
+    def __init__(self, preferences, num_days=None, num_shifts=None, coverage=default_coverage,
+                 min_shifts=default_min_shifts, names=None):
+        self.schedule = build_model(preferences, num_days, num_shifts, coverage, min_shifts)
+        if names is None:
+            names = ['worker %i' % idx for idx in range(self.schedule.shifts.shape[0])]
+        self.names = list(names)
+        self.result = None
+        # hint[n, d, s]: the last feasible roster, kept aligned with added/removed workers.
+        self.hint = None
+
+    @property
+    def preferences(self):
+        return self.schedule.preferences
+
+    def worker_index(self, worker):
+        if isinstance(worker, str):
+            return self.names.index(worker)
+        return worker
+
+    def set_preference(self, worker, d, s, value=1):
+        # e.g. set_preference('dana', 2, 1): dana now refuses Tuesday evening.
+        self.schedule.set_preference(self.worker_index(worker), d, s, value)
+
+    def set_preferences(self, worker, preferences):
+        n = self.worker_index(worker)
+        preferences = np.asarray(preferences, dtype=np.int64).reshape(self.preferences.shape[1:])
+        for d, s in zip(*np.nonzero(preferences != self.preferences[n])):
+            self.schedule.set_preference(n, d, s, preferences[d, s])
+
+    def set_coverage(self, d, s, value):
+        self.schedule.set_coverage(d, s, value)
+
+    def add_worker(self, preferences, name=None):
+        preferences = np.asarray(preferences, dtype=np.int64).reshape(self.preferences.shape[1:])
+        if (preferences < 0).any():
+            raise ValueError('preferences must be non-negative')
+        n = self.schedule.add_worker(preferences)
+        self.names.append('worker %i' % n if name is None else name)
+        if self.hint is not None:
+            self.hint = np.concatenate([self.hint, np.zeros((1,) + self.hint.shape[1:], dtype=bool)])
+        return n
+
+    def remove_worker(self, worker):
+        n = self.worker_index(worker)
+        self.schedule.remove_worker(n)
+        del self.names[n]
+        if self.hint is not None:
+            self.hint = np.delete(self.hint, n, axis=0)
+
+    def add_hints(self):
+        model = self.schedule.model
+        model.ClearHints()
+        if self.hint is None:
+            return
+        for var, value in zip(self.schedule.shifts.ravel(), self.hint.ravel()):
+            model.AddHint(var, int(value))
+
+    def solve(self, max_time_in_seconds=None, num_search_workers=0, sinks=None):
+        # The first report also holds the model build; later solves get a fresh one.
+        if self.result is not None:
+            self.schedule.report = SolveReport()
+        with self.schedule.report.phase('hints'):
+            self.add_hints()
+        self.result = run_solver(self.schedule, make_solver(max_time_in_seconds, num_search_workers), self.names)
+        emit(self.result.report, sinks)
+        if self.result.feasible:
+            self.hint = self.result.assignment.copy()
+        return self.result
@@ -0,0 +1,138 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+class SolveReport:
+    # Where the time of one solve went and how hard the search was. Phases are, in
+    # order: preferences, variables, constraints, objective, solve, extract (CP-SAT) or
+    # preferences, detect, network, solve, extract (flow).
+    def __init__(self, engine='cp-sat'):
+        self.engine = engine
+        self.phases = {}
+        self.status_name = None
+        self.objective = None
+        self.best_bound = None
+        self.gap = None
+        self.conflicts = None
+        self.branches = None
+        self.wall_time = None
+        self.user_time = None
+        self.shape = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    @property
+    def total_seconds(self):
+        return sum(self.phases.values())
+
+    def record_solver(self, solver):
+        self.conflicts = solver.NumConflicts()
+        self.branches = solver.NumBranches()
+        self.wall_time = solver.WallTime()
+        self.user_time = solver.UserTime()
+        self.best_bound = solver.BestObjectiveBound()
+
+    def record_result(self, result):
+        self.status_name = result.status_name
+        self.objective = result.objective
+        self.shape = result.assignment.shape
+        if result.objective is not None and self.best_bound is not None:
+            self.gap = abs(result.objective - self.best_bound) / max(1, abs(result.objective))
+        elif result.optimal:
+            self.gap = 0.0
+
+    def as_dict(self):
+        return {
+            'engine': self.engine, 'status': self.status_name, 'objective': self.objective,
+            'best_bound': self.best_bound, 'gap': self.gap, 'conflicts': self.conflicts,
+            'branches': self.branches, 'wall_time': self.wall_time, 'user_time': self.user_time,
+            'workers': self.shape[0] if self.shape else None, 'phases': dict(self.phases),
+            'total_seconds': self.total_seconds,
+        }
+
+
+class JsonLogSink:
+    # One JSON line per solve, to a stream (stderr by default) or a file path.
+    def __init__(self, stream=None, path=None, extra=None):
+        self.stream = stream
+        self.path = path
+        self.extra = extra or {}
+
+    def emit(self, report):
+        line = json.dumps(dict(self.extra, **report.as_dict())) + '\n'
+        if self.path is not None:
+            with open(self.path, 'a') as f:
+                f.write(line)
+        else:
+            (self.stream or sys.stderr).write(line)
+
+
+def escape_label(value):
+    # The text format escapes backslash, newline and double quote in label values;
+    # backslash goes first so the escapes added after it are left alone.
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class PrometheusTextfileSink:
+    # Rewrites a node_exporter textfile-collector file with the last solve's metrics.
+    def __init__(self, path, prefix='schedule_', labels=None):
+        self.path = path
+        self.prefix = prefix
+        self.labels = labels or {}
+
+    def format_labels(self, report, **labels):
+        labels = dict(self.labels, engine=report.engine, **labels)
+        return '{%s}' % ','.join('%s="%s"' % (key, escape_label(value)) for key, value in sorted(labels.items()))
+
+    def lines(self, report):
+        metrics = [
+            ('phase_seconds', 'Seconds spent in each scheduling phase.',
+             [(self.format_labels(report, phase=phase), seconds) for phase, seconds in report.phases.items()]),
+            ('status', 'Solver status of the last solve, 1 for the reported status.',
+             [(self.format_labels(report, status=report.status_name), 1)]),
+        ]
+        for name, value, description in (
+                ('objective', report.objective, 'Undesired shifts in the roster.'),
+                ('best_bound', report.best_bound, 'Best proven objective bound.'),
+                ('gap', report.gap, 'Relative gap between objective and bound.'),
+                ('conflicts', report.conflicts, 'CP-SAT conflicts.'),
+                ('branches', report.branches, 'CP-SAT branches.'),
+                ('wall_seconds', report.wall_time, 'CP-SAT wall time.'),
+                ('user_seconds', report.user_time, 'CP-SAT user time.'),
+                ('total_seconds', report.total_seconds, 'Seconds spent in all phases.')):
+            if value is not None:
+                metrics.append((name, description, [(self.format_labels(report), value)]))
+        for name, description, samples in metrics:
+            yield '# HELP %s%s %s' % (self.prefix, name, description)
+            yield '# TYPE %s%s gauge' % (self.prefix, name)
+            for labels, value in samples:
+                yield '%s%s%s %s' % (self.prefix, name, labels, float(value))
+
+    def emit(self, report):
+        # Written to a temporary file and renamed, so the collector never reads half a file.
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write('\n'.join(self.lines(report)) + '\n')
+        os.replace(tmp, self.path)
+
+
+class CallbackSink:
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, report):
+        self.callback(report)
+
+
+def emit(report, sinks):
+    for sink in sinks or ():
+        sink.emit(report)
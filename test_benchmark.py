@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from benchmark import compare, generate_instance, main, run_case
+from flow import solve_flow
+
+
+def test_generator_is_seeded():
+    first = generate_instance(50, seed=3)
+    second = generate_instance(50, seed=3)
+    assert (first[0] == second[0]).all() and first[1:] == second[1:]
+    assert not (generate_instance(50, seed=4)[0] == first[0]).all()
+
+
+@pytest.mark.parametrize('kind, feasible', [('random', True), ('tight', True), ('infeasible', False)])
+def test_instance_kinds(kind, feasible):
+    prefs, coverage, min_shifts = generate_instance(40, staffing=0.4, kind=kind)
+    assert solve_flow(prefs, coverage=coverage, min_shifts=min_shifts).feasible == feasible
+
+
+def test_generator_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        generate_instance(10, kind='huge')
+
+
+@pytest.mark.parametrize('engine', ['flow', 'auto', 'cp-sat', 'sharded'])
+def test_run_case(engine):
+    record = run_case(engine, 20, kind='tight', max_time_in_seconds=10)
+    assert record['status'] in ('OPTIMAL', 'FEASIBLE')
+    assert record['objective'] == run_case('flow', 20, kind='tight')['objective']
+    assert record['build_seconds'] >= 0 and record['solve_seconds'] > 0
+    assert record['peak_python_mb'] > 0
+    json.dumps(record)
+
+
+def test_compare_flags_slowdowns():
+    old = run_case('flow', 8)
+    fast = dict(old, solve_seconds=0.5)
+    slow = dict(old, solve_seconds=0.7)
+    assert compare([slow], [fast]) == [(slow, fast, 'solve_seconds')]
+    assert compare([slow], [fast], threshold=0.5) == []
+    assert compare([fast], [slow]) == []
+    assert compare([dict(fast, status='UNKNOWN')], [fast]) == [(dict(fast, status='UNKNOWN'), fast, 'status')]
+    # Process-wide peak memory only grows over a suite and is not a regression.
+    grown = dict(fast, process_max_rss_mb=fast['process_max_rss_mb'] * 10)
+    assert compare([grown], [fast]) == []
+
+
+def test_cli(tmp_path, capsys):
+    out = str(tmp_path / 'results.jsonl')
+    assert main(['--engines', 'flow', '--sizes', '8,30', '--out', out]) == 0
+    with open(out) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 6
+
+    assert main(['--engines', 'flow', '--sizes', '8,30', '--baseline', out, '--threshold', '1000']) == 0
+    assert 'REGRESSION' not in capsys.readouterr().out
+    # A baseline where the random instances were infeasible makes them count as changed.
+    baseline = str(tmp_path / 'baseline.jsonl')
+    with open(baseline, 'w') as f:
+        f.writelines(json.dumps(dict(record, status='INFEASIBLE')) + '\n' for record in records)
+    assert main(['--engines', 'flow', '--sizes', '8,30', '--baseline', baseline]) == 1
+    assert capsys.readouterr().out.count('REGRESSION') == 4
+
+
+def test_run_case_without_memory():
+    assert run_case('flow', 8, measure_memory=False)['peak_python_mb'] is None
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from ortools.sat.python import cp_model
+
+from decompose import solve_sharded, split_coverage
+from flow import solve_flow
+from scheduler import solve_schedule
+from test_scheduler import random_preferences
+
+
+def test_split_coverage():
+    quotas = split_coverage(np.full((7, 2), 10), [5, 3, 2])
+    assert (quotas.sum(axis=-1) == 10).all()
+    assert (quotas[0, 0] == [5, 3, 2]).all()
+    quotas = split_coverage(np.full((7, 2), 4), [3, 3, 3])
+    assert (quotas.sum(axis=-1) == 4).all()
+    assert (quotas.max(axis=-1) - quotas.min(axis=-1) <= 1).all()
+
+
+@pytest.mark.parametrize('engine', ['flow', 'cp-sat'])
+def test_sharded_roster_is_valid(engine):
+    prefs = random_preferences(4, shape=(60, 7, 2))
+    groups = np.arange(60) % 3
+    result = solve_sharded(prefs, groups, coverage=20, min_shifts=3, engine=engine, max_processes=1)
+    assert result.feasible and not result.fallback
+    assert (result.assignment.sum(axis=0) == 20).all()
+    assert (result.shifts_per_worker() >= 3).all()
+    assert result.objective == (result.assignment * prefs).sum()
+    assert [shard.group for shard in result.shards] == [0, 1, 2]
+    assert all(shard.seconds >= 0 for shard in result.shards)
+    assert result.bound == solve_flow(prefs, coverage=20, min_shifts=3).objective
+    assert 0 <= result.gap < 1
+
+
+def test_process_pool():
+    prefs = random_preferences(5, shape=(40, 7, 2))
+    groups = np.array(['north', 'south'] * 20)
+    result = solve_sharded(prefs, groups, coverage=12, max_processes=2)
+    assert result.feasible
+    assert (result.assignment.sum(axis=0) == 12).all()
+
+
+def test_reconciliation_absorbs_infeasible_shard():
+    prefs = random_preferences(6, shape=(20, 7, 2))
+    # The one-person team gets no share of a coverage of 2, so alone it cannot reach
+    # its minimum shift.
+    groups = np.array([0] * 19 + [1])
+    result = solve_sharded(prefs, groups, coverage=2, min_shifts=1, max_processes=1)
+    assert result.shards[1].status == cp_model.INFEASIBLE
+    assert result.feasible and not result.fallback
+    assert (result.assignment.sum(axis=0) == 2).all()
+    assert (result.shifts_per_worker() >= 1).all()
+
+
+def test_independent_shards():
+    prefs = random_preferences(7, shape=(30, 7, 2))
+    groups = np.array(['a'] * 10 + ['b'] * 20)
+    result = solve_sharded(prefs, groups, coverage={'a': 3, 'b': 6}, max_processes=1)
+    assert result.optimal
+    assert (result.assignment[:10].sum(axis=0) == 3).all()
+    assert (result.assignment[10:].sum(axis=0) == 6).all()
+    expected = (solve_schedule(prefs[:10], coverage=3).objective
+                + solve_schedule(prefs[10:], coverage=6).objective)
+    assert result.objective == expected
+
+
+def test_infeasible():
+    result = solve_sharded(random_preferences(shape=(6, 7, 2)), np.arange(6) % 2, coverage=8,
+                           max_processes=1)
+    assert not result.feasible
+    assert result.fallback
+
+
+def test_coupled_without_compare_is_not_optimal():
+    prefs = random_preferences(4, shape=(60, 7, 2))
+    result = solve_sharded(prefs, np.arange(60) % 3, coverage=20, min_shifts=3, max_processes=1, compare=False)
+    assert all(shard.status == cp_model.OPTIMAL for shard in result.shards)
+    assert result.status == cp_model.FEASIBLE
+    assert result.bound is None
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError, match='unknown engine'):
+        solve_sharded(random_preferences(), np.arange(8) % 2, engine='cpsat', max_processes=1)
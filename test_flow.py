@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from ortools.sat.python import cp_model
+
+from flow import flow_instance, solve_flow, solve_model
+from scheduler import build_model, solve_schedule
+from session import ScheduleSession
+from test_scheduler import random_preferences
+
+
+@pytest.mark.parametrize('seed, shape, coverage, min_shifts', [
+    (0, (8, 7, 2), 4, 2),
+    (1, (12, 5, 3), 5, 3),
+    (2, (30, 7, 2), 9, 4),
+])
+def test_matches_cp_sat(seed, shape, coverage, min_shifts):
+    prefs = random_preferences(seed, shape) * np.random.default_rng(seed).integers(1, 4, shape)
+    result = solve_flow(prefs, coverage=coverage, min_shifts=min_shifts)
+    assert result.optimal
+    assert result.objective == solve_schedule(prefs, coverage=coverage, min_shifts=min_shifts).objective
+    assert (result.assignment.sum(axis=0) == coverage).all()
+    assert (result.shifts_per_worker() >= min_shifts).all()
+    assert (result.undesired() * prefs).sum() == result.objective
+
+
+def test_per_shift_coverage():
+    prefs = random_preferences()
+    coverage = np.random.default_rng(0).integers(2, 6, (7, 2))
+    result = solve_flow(prefs, coverage=coverage)
+    assert (result.assignment.sum(axis=0) == coverage).all()
+    assert result.objective == solve_schedule(prefs, coverage=coverage).objective
+
+
+@pytest.mark.parametrize('coverage, min_shifts', [(4, 8), (9, 2), (1, 3)])
+def test_infeasible(coverage, min_shifts):
+    result = solve_flow(random_preferences(), coverage=coverage, min_shifts=min_shifts)
+    assert not result.feasible
+    assert not solve_schedule(random_preferences(), coverage=coverage, min_shifts=min_shifts).feasible
+    assert not result.assignment.any()
+
+
+def test_detects_flow_models():
+    prefs = random_preferences()
+    instance = flow_instance(build_model(prefs))
+    assert instance is not None
+    costs, coverage, lower, allowed = instance
+    assert (costs == prefs).all()
+    assert (coverage == 4).all() and (lower == 2).all() and allowed.all()
+
+
+def test_patched_session_model_stays_flow():
+    prefs = random_preferences()
+    session = ScheduleSession(prefs)
+    session.set_preference(0, 0, 0, 3)
+    session.set_coverage(1, 1, 5)
+    session.add_worker(np.zeros((7, 2)))
+    session.remove_worker(3)
+    assert flow_instance(session.schedule) is not None
+    result = solve_model(session.schedule)
+    assert result.objective == session.solve().objective
+    assert result.assignment.shape == (8, 7, 2)
+
+
+def test_falls_back_to_cp_sat():
+    prefs = random_preferences()
+    schedule = build_model(prefs)
+    # No worker works both shifts of the same day: not a flow constraint.
+    for n in range(8):
+        for d in range(7):
+            schedule.model.Add(schedule.shifts[n, d, 0] + schedule.shifts[n, d, 1] <= 1)
+    assert flow_instance(schedule) is None
+    result = solve_model(schedule)
+    assert result.feasible
+    assert (result.assignment.sum(axis=2) <= 1).all()
+    assert result.objective >= solve_flow(prefs).objective
+
+
+def test_extra_variables_fall_back():
+    schedule = build_model(random_preferences())
+    # A new variable tied to the roster makes the model richer than a flow model.
+    overtime = schedule.model.NewBoolVar('overtime')
+    schedule.model.Add(schedule.shifts[0, 0, 0] <= overtime)
+    assert flow_instance(schedule) is None
+
+
+def test_cost_overflow_is_not_infeasible():
+    result = solve_flow(np.full((8, 7, 2), 2 ** 62), coverage=4)
+    assert result.status == cp_model.MODEL_INVALID
+    assert not result.feasible
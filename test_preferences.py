@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+from flow import solve_flow
+from preferences import PreferenceStore, load_binary, load_csv, load_jsonl, load_preferences
+from scheduler import solve_schedule
+from test_scheduler import random_preferences
+
+
+def test_round_trip_and_queries():
+    prefs = random_preferences(shape=(20, 7, 2))
+    store = PreferenceStore.from_matrix(prefs)
+    assert store.bits.dtype == np.uint8 and store.bits.shape == (20, 2)
+    assert (store.to_matrix() == prefs).all()
+    for d in range(7):
+        for s in range(2):
+            assert (store.available(d, s) == (prefs[:, d, s] == 0)).all()
+    assert (store.available_counts() == (prefs == 0).sum(axis=0)).all()
+    assert store.available_names(0, 0) == ['worker %i' % n for n in np.flatnonzero(prefs[:, 0, 0] == 0)]
+
+
+def test_solvers_take_the_store():
+    prefs = random_preferences()
+    store = PreferenceStore.from_matrix(prefs)
+    assert solve_schedule(store).objective == solve_schedule(prefs).objective
+    assert solve_flow(store, names=store.names).objective == solve_flow(prefs).objective
+
+
+def test_binary_store(tmp_path):
+    prefs = random_preferences(shape=(50, 7, 3))
+    path = str(tmp_path / 'prefs.bin')
+    PreferenceStore.from_matrix(prefs, ['n%i' % n for n in range(50)]).save(path)
+    for mmap in (True, False):
+        store = load_binary(path, mmap)
+        assert store.shape == (50, 7, 3)
+        assert store.names[3] == 'n3'
+        assert (store.to_matrix() == prefs).all()
+    assert isinstance(load_preferences(path).bits, np.memmap)
+
+
+def test_csv(tmp_path):
+    prefs = random_preferences(shape=(5, 7, 2))
+    path = tmp_path / 'prefs.csv'
+    lines = ['name,' + ','.join('c%i' % c for c in range(14))]
+    lines += ['w%i,' % n + ','.join(map(str, prefs[n].ravel())) for n in range(5)]
+    path.write_text('\n'.join(lines) + '\n')
+    store = load_csv(str(path), 7, 2)
+    assert store.names == ['w0', 'w1', 'w2', 'w3', 'w4']
+    assert (store.to_matrix() == prefs).all()
+
+
+def test_jsonl(tmp_path):
+    path = tmp_path / 'prefs.jsonl'
+    path.write_text(json.dumps({'name': 'a', 'shifts': [1] + [0] * 13}) + '\n'
+                    + json.dumps({'name': 'b', 'refuse': [[2, 1], [6, 0]]}) + '\n')
+    store = load_preferences(str(path), 7, 2)
+    assert store.names == ['a', 'b']
+    assert store.to_matrix()[0, 0, 0] == 1 and store.to_matrix()[0].sum() == 1
+    assert list(zip(*np.nonzero(store.to_matrix()[1]))) == [(2, 1), (6, 0)]
+
+
+def test_csv_rejects_bad_cells(tmp_path):
+    path = tmp_path / 'prefs.csv'
+    path.write_text('a,' + ','.join(['0'] * 13) + ',2\n')
+    with pytest.raises(ValueError):
+        load_csv(str(path), 7, 2)
+    path.write_text('a,' + ','.join(['0'] * 13) + '\n')
+    with pytest.raises(ValueError):
+        load_csv(str(path), 7, 2)
+    path.write_text('a,10,' + ','.join(['0'] * 12) + '\n')
+    with pytest.raises(ValueError, match='line 1'):
+        load_csv(str(path), 7, 2)
+    path.write_text('a,10,,' + ','.join(['0'] * 12) + '\n')
+    with pytest.raises(ValueError, match='line 1'):
+        load_csv(str(path), 7, 2)
+    path.write_text('a,' + ','.join(['0'] * 14) + '\n' + 'b,' + ','.join(['0'] * 13) + ',2\n')
+    with pytest.raises(ValueError, match='line 2'):
+        load_csv(str(path), 7, 2)
+
+
+def test_csv_rejects_misaligned_rows(tmp_path):
+    # 13 + 15 cells add up to two full rows, but neither row is one.
+    path = tmp_path / 'prefs.csv'
+    path.write_text('a,' + ','.join(['0'] * 13) + '\n' + 'b,' + ','.join(['1'] * 15) + '\n')
+    with pytest.raises(ValueError, match='line 1'):
+        load_csv(str(path), 7, 2)
+    path.write_text('a,' + ','.join(['0'] * 14) + '\n' + 'b,' + ','.join(['1'] * 15) + '\n')
+    with pytest.raises(ValueError, match='line 2'):
+        load_csv(str(path), 7, 2)
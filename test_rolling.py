@@ -0,0 +1,64 @@
+import numpy as np
+
+from rolling import CarryOver, iter_windows, solve_horizon
+from scheduler import solve_schedule
+from test_scheduler import random_preferences
+
+
+def test_single_window_matches_solve_schedule():
+    prefs = random_preferences()
+    result = solve_horizon(prefs, fairness=0)
+    assert result.optimal
+    assert result.objective == solve_schedule(prefs).objective
+
+
+def test_horizon_is_solved_window_by_window():
+    prefs = random_preferences(1, shape=(10, 30, 2))
+    results = list(iter_windows(prefs, coverage=4))
+    assert [result.start_day for result in results] == [0, 7, 14, 21, 28]
+    assert [result.assignment.shape[1] for result in results] == [7, 7, 7, 7, 2]
+    assert (results[-1].carry.worked == sum(result.shifts_per_worker() for result in results)).all()
+    assert (results[-1].carry.undesired == sum(result.undesired_per_worker() for result in results)).all()
+
+    horizon = solve_horizon(prefs, coverage=4)
+    assert horizon.feasible and not horizon.optimal
+    assert (horizon.assignment.sum(axis=0) == 4).all()
+    assert horizon.objective == sum(result.objective for result in results)
+
+
+def test_windows_from_an_iterator():
+    prefs = random_preferences(2, shape=(10, 21, 2))
+    weeks = (prefs[:, start:start + 7] for start in range(0, 21, 7))
+    streamed = [result.objective for result in iter_windows(weeks)]
+    assert streamed == [result.objective for result in iter_windows(prefs)]
+
+
+def test_fairness_spreads_undesired_shifts():
+    prefs = random_preferences(0, shape=(12, 56, 2)) | random_preferences(1, shape=(12, 56, 2))
+    plain = solve_horizon(prefs, coverage=6, fairness=0)
+    fair = solve_horizon(prefs, coverage=6, fairness=1)
+    assert fair.objective == plain.objective
+    assert np.ptp(fair.undesired_per_worker()) < np.ptp(plain.undesired_per_worker())
+
+
+def test_rest_rule_across_window_boundary():
+    prefs = random_preferences(3, shape=(10, 14, 2))
+    horizon = solve_horizon(prefs, rest=True)
+    assert horizon.feasible
+    evening_then_morning = horizon.assignment[:, :-1, 1] & horizon.assignment[:, 1:, 0]
+    assert not evening_then_morning.any()
+
+
+def test_carry_over_last_shift():
+    carry = CarryOver(3)
+    prefs = np.zeros((3, 2, 2), dtype=int)
+    result = solve_schedule(prefs, coverage=1, min_shifts=0)
+    carry.update(result)
+    expected = [1 if result.assignment[n, -1, 1] else 0 if result.assignment[n, -1, 0] else -1 for n in range(3)]
+    assert list(carry.last_shift) == expected
+
+
+def test_stops_at_infeasible_window():
+    results = list(iter_windows(random_preferences(shape=(3, 14, 2))))
+    assert len(results) == 1
+    assert not results[0].feasible
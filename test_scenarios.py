@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from flow import solve_flow
+from scenarios import format_table, run_scenarios
+from test_scheduler import random_preferences
+
+
+def test_scenarios_match_direct_solves():
+    prefs = random_preferences(1)
+    names = ['w%i' % n for n in range(8)]
+    table = run_scenarios(prefs, [
+        {'name': '4 per shift'},
+        {'name': '3 per shift', 'coverage': 3},
+        {'name': 'without w2', 'exclude': ['w2']},
+        {'name': 'weekdays', 'days': 5, 'min_shifts': 1},
+        {'name': 'cp-sat', 'engine': 'cp-sat'},
+    ], names=names, max_processes=1)
+    assert [row['scenario'] for row in table] == ['4 per shift', '3 per shift', 'without w2', 'weekdays', 'cp-sat']
+    assert table[0]['objective'] == solve_flow(prefs).objective
+    assert table[1]['objective'] == solve_flow(prefs, coverage=3).objective
+    assert table[2]['objective'] == solve_flow(np.delete(prefs, 2, axis=0)).objective
+    assert table[2]['workers'] == 7
+    assert table[3]['objective'] == solve_flow(prefs[:, :5], min_shifts=1).objective
+    assert table[4]['objective'] == table[0]['objective']
+    assert all(row['feasible'] and row['undesired'] == row['objective'] for row in table)
+    assert not any(row['cached'] for row in table)
+
+
+def test_infeasible_scenario():
+    table = run_scenarios(random_preferences(), [{'coverage': 9}, {'min_shifts': 8}], max_processes=1)
+    assert [row['feasible'] for row in table] == [False, False]
+    assert table[0]['objective'] is None and table[0]['undesired'] is None
+    assert table[0]['scenario'] == 'scenario 0'
+
+
+def test_days_and_week_coverage():
+    prefs = random_preferences()
+    coverage = np.random.default_rng(0).integers(2, 5, (7, 2))
+    table = run_scenarios(prefs, [{'days': 5, 'coverage': coverage, 'min_shifts': 1}], max_processes=1)
+    assert table[0]['objective'] == solve_flow(prefs[:, :5], coverage=coverage[:5], min_shifts=1).objective
+
+
+@pytest.mark.parametrize('scenario, message', [
+    ({'days': 10}, 'days must be between 1 and 7'),
+    ({'days': 0}, 'days must be between 1 and 7'),
+    ({'coverage': np.full((5, 2), 4)}, 'does not fit 7 days x 2 shifts'),
+    ({'engine': 'cpsat'}, 'unknown engine'),
+])
+def test_invalid_scenarios(scenario, message):
+    with pytest.raises(ValueError, match=message):
+        run_scenarios(random_preferences(), [scenario], max_processes=1)
+
+
+def test_identical_scenarios_are_solved_once():
+    prefs = random_preferences()
+    cache = {}
+    table = run_scenarios(prefs, [{'coverage': 4}, {'name': 'same', 'coverage': np.full((7, 2), 4)}, {}],
+                          cache=cache, max_processes=1)
+    assert len(cache) == 1
+    assert [row['cached'] for row in table] == [False, True, True]
+    assert len({row['key'] for row in table}) == 1
+
+    again = run_scenarios(prefs, [{'coverage': 4}, {'coverage': 3}], cache=cache, max_processes=1)
+    assert [row['cached'] for row in again] == [True, False]
+    assert len(cache) == 2
+
+
+def test_base_parameters_and_process_pool():
+    prefs = random_preferences(2, shape=(30, 7, 2))
+    scenarios = [{'coverage': coverage} for coverage in (8, 10, 12)] + [{'exclude': [0, 1]}]
+    table = run_scenarios(prefs, scenarios, base={'coverage': 10, 'min_shifts': 3}, max_processes=2)
+    assert [row['objective'] for row in table] == [
+        solve_flow(prefs, coverage=8, min_shifts=3).objective,
+        solve_flow(prefs, coverage=10, min_shifts=3).objective,
+        solve_flow(prefs, coverage=12, min_shifts=3).objective,
+        solve_flow(prefs[2:], coverage=10, min_shifts=3).objective,
+    ]
+    text = format_table(table)
+    assert text.splitlines()[0].startswith('scenario | status | objective')
+    assert len(text.splitlines()) == 5
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from ortools.sat.python import cp_model
+
+from scheduler import as_preference_matrix, iter_schedules, solve_schedule
+
+
+def baseline_objective(shift_requests, coverage, min_shifts):
+    # The dict-based model calculate_shifts used before the array API.
+    num_workers, num_days, num_shifts = np.shape(shift_requests)
+    model = cp_model.CpModel()
+    shifts = {}
+    for n in range(num_workers):
+        for d in range(num_days):
+            for s in range(num_shifts):
+                shifts[(n, d, s)] = model.NewBoolVar('shift_n%id%is%i' % (n, d, s))
+    for d in range(num_days):
+        for s in range(num_shifts):
+            model.Add(sum(shifts[(n, d, s)] for n in range(num_workers)) == coverage)
+    for n in range(num_workers):
+        model.Add(sum(shifts[(n, d, s)] for d in range(num_days) for s in range(num_shifts)) >= min_shifts)
+    model.Minimize(sum(int(shift_requests[n][d][s]) * shifts[(n, d, s)] for n in range(num_workers)
+                       for d in range(num_days) for s in range(num_shifts)))
+    solver = cp_model.CpSolver()
+    assert solver.Solve(model) == cp_model.OPTIMAL
+    return int(solver.ObjectiveValue())
+
+
+def random_preferences(seed=0, shape=(8, 7, 2)):
+    return (np.random.default_rng(seed).random(shape) < 0.4).astype(int)
+
+
+def test_matches_baseline_model():
+    prefs = random_preferences()
+    result = solve_schedule(prefs, 7, 2, coverage=4, min_shifts=2)
+    assert result.optimal
+    assert result.objective == baseline_objective(prefs, 4, 2)
+    assert (result.assignment.sum(axis=0) == 4).all()
+    assert (result.shifts_per_worker() >= 2).all()
+    assert result.undesired().sum() == result.objective
+
+
+def test_small_fixed_instance():
+    prefs = np.zeros((3, 2, 2), dtype=int)
+    prefs[0] = 1
+    prefs[1, 0, 0] = 1
+    result = solve_schedule(prefs, coverage=2, min_shifts=1, names=['a', 'b', 'c'])
+    assert result.objective == 1
+    assert result.workers_on(0, 0) == ['a', 'c']
+    assert list(result.undesired_per_worker()) == [1, 0, 0]
+
+
+def test_coverage_larger_than_workers_is_infeasible():
+    result = solve_schedule(random_preferences(shape=(3, 7, 2)), coverage=4)
+    assert not result.feasible
+    assert result.objective is None
+    assert not result.assignment.any()
+    assert result.assignment.shape == (3, 7, 2)
+
+
+def test_flat_preferences_are_reshaped():
+    prefs = random_preferences(1)
+    flat = prefs.reshape(8, 14)
+    assert (as_preference_matrix(flat, num_shifts=2) == prefs).all()
+    assert solve_schedule(flat, 7, 2).objective == solve_schedule(prefs).objective
+
+
+@pytest.mark.parametrize('preferences, kwargs', [
+    (np.zeros((8, 14)), {}),
+    (np.zeros(14), {}),
+    (np.zeros((8, 7, 2)), {'num_days': 5}),
+    (np.zeros((8, 7, 2)), {'num_shifts': 3}),
+    (-np.ones((8, 7, 2)), {}),
+])
+def test_invalid_preferences(preferences, kwargs):
+    with pytest.raises(ValueError):
+        as_preference_matrix(preferences, **kwargs)
+
+
+def test_time_limit_and_search_workers():
+    prefs = random_preferences()
+    result = solve_schedule(prefs, max_time_in_seconds=10, num_search_workers=1)
+    assert result.optimal
+    assert result.objective == solve_schedule(prefs).objective
+
+
+def test_iter_schedules_streams_improving_rosters():
+    prefs = random_preferences(2, shape=(40, 7, 2))
+    results = list(iter_schedules(prefs, coverage=12, num_search_workers=1))
+    objectives = [result.objective for result in results]
+    assert objectives == sorted(objectives, reverse=True)
+    assert all(result.status == cp_model.FEASIBLE for result in results[:-1])
+    assert results[-1].optimal
+    assert (results[-1].assignment.sum(axis=0) == 12).all()
+
+
+def test_iter_schedules_can_stop_early():
+    schedules = iter_schedules(random_preferences(3, shape=(40, 7, 2)), coverage=12)
+    first = next(schedules)
+    schedules.close()
+    assert first.feasible
+
+
+def test_iter_schedules_infeasible():
+    results = list(iter_schedules(random_preferences(shape=(3, 7, 2)), coverage=4))
+    assert len(results) == 1
+    assert not results[0].feasible
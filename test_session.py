@@ -0,0 +1,67 @@
+import numpy as np
+
+from scheduler import solve_schedule
+from session import ScheduleSession
+from test_scheduler import random_preferences
+
+
+def assert_valid(result, coverage=4, min_shifts=2):
+    assert result.feasible
+    assert (result.assignment.sum(axis=0) == coverage).all()
+    assert (result.shifts_per_worker() >= min_shifts).all()
+    assert result.undesired().sum() == result.objective
+
+
+def test_session_matches_fresh_solve():
+    session = ScheduleSession(random_preferences())
+    result = session.solve()
+    assert_valid(result)
+    assert result.objective == solve_schedule(random_preferences()).objective
+
+
+def test_preference_edits_patch_the_objective():
+    prefs = random_preferences()
+    session = ScheduleSession(prefs, names=['w%i' % idx for idx in range(8)])
+    first = session.solve()
+    n, d, s = np.argwhere(first.assignment & (prefs == 0))[0]
+    session.set_preference('w%i' % n, d, s)
+    prefs[n, d, s] = 1
+    assert_valid(session.solve())
+    assert session.result.objective == solve_schedule(prefs).objective
+
+    prefs[0] = 0
+    session.set_preferences(0, np.zeros(14))
+    assert session.solve().objective == solve_schedule(prefs).objective
+
+
+def test_add_and_remove_workers():
+    prefs = random_preferences()
+    session = ScheduleSession(prefs)
+    session.solve()
+
+    extra = random_preferences(5, shape=(1, 7, 2))
+    assert session.add_worker(extra[0], name='new') == 8
+    prefs = np.concatenate([prefs, extra])
+    result = session.solve()
+    assert_valid(result)
+    assert result.names[-1] == 'new'
+    assert result.objective == solve_schedule(prefs).objective
+
+    session.remove_worker(2)
+    prefs = np.delete(prefs, 2, axis=0)
+    result = session.solve()
+    assert_valid(result)
+    assert result.assignment.shape == (8, 7, 2)
+    assert result.objective == solve_schedule(prefs).objective
+
+
+def test_set_coverage():
+    prefs = random_preferences()
+    session = ScheduleSession(prefs)
+    session.solve()
+    session.set_coverage(0, 0, 2)
+    result = session.solve()
+    assert result.assignment[:, 0, 0].sum() == 2
+    expected = np.full((7, 2), 4)
+    expected[0, 0] = 2
+    assert result.objective == solve_schedule(prefs, coverage=expected).objective
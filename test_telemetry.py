@@ -0,0 +1,113 @@
+import io
+import json
+import time
+
+from ortools.sat.python import cp_model
+
+import main
+from flow import solve_flow, solve_model
+from scheduler import build_model, solve_schedule
+from session import ScheduleSession
+from telemetry import CallbackSink, JsonLogSink, PrometheusTextfileSink
+from test_scheduler import random_preferences
+
+
+def test_cp_sat_report():
+    result = solve_schedule(random_preferences())
+    report = result.report
+    assert report.engine == 'cp-sat'
+    assert list(report.phases) == ['preferences', 'variables', 'constraints', 'objective', 'solve', 'extract']
+    assert report.status_name == 'OPTIMAL'
+    assert report.objective == result.objective
+    assert report.best_bound == result.objective and report.gap == 0
+    assert report.conflicts >= 0 and report.branches >= 0 and report.wall_time > 0
+
+
+def test_flow_reports():
+    report = solve_flow(random_preferences()).report
+    assert report.engine == 'flow'
+    assert list(report.phases) == ['preferences', 'network', 'solve', 'extract']
+    assert report.conflicts is None and report.gap == 0
+
+    report = solve_model(build_model(random_preferences())).report
+    assert report.engine == 'flow'
+    assert 'detect' in report.phases and 'variables' in report.phases
+
+
+def test_real_status(capsys):
+    result = solve_schedule(random_preferences(shape=(3, 7, 2)))
+    assert result.status == cp_model.INFEASIBLE
+    result.print_schedule()
+    assert capsys.readouterr().out == 'there is no solution!\n'
+
+    # A zero time limit stops the solver before its first solution.
+    result = solve_schedule(random_preferences(), max_time_in_seconds=0, num_search_workers=1)
+    assert result.status == cp_model.UNKNOWN
+    assert result.report.status_name == 'UNKNOWN' and result.report.objective is None
+    result.print_schedule()
+    assert capsys.readouterr().out == 'no schedule found (UNKNOWN)\n'
+
+
+def test_sinks(tmp_path):
+    stream = io.StringIO()
+    reports = []
+    textfile = str(tmp_path / 'schedule.prom')
+    result = solve_schedule(random_preferences(), sinks=[
+        JsonLogSink(stream, extra={'site': 'north'}),
+        PrometheusTextfileSink(textfile, labels={'site': 'north'}),
+        CallbackSink(reports.append),
+    ])
+    line = json.loads(stream.getvalue())
+    assert line['site'] == 'north' and line['status'] == 'OPTIMAL' and line['objective'] == result.objective
+    assert set(line['phases']) >= {'variables', 'solve'}
+    assert reports == [result.report]
+    with open(textfile) as f:
+        metrics = f.read()
+    assert 'schedule_phase_seconds{engine="cp-sat",phase="solve",site="north"}' in metrics
+    assert 'schedule_status{engine="cp-sat",site="north",status="OPTIMAL"} 1.0' in metrics
+    assert 'schedule_objective{engine="cp-sat",site="north"} %s' % float(result.objective) in metrics
+
+
+def test_prometheus_label_escaping(tmp_path):
+    textfile = str(tmp_path / 'schedule.prom')
+    sink = PrometheusTextfileSink(textfile, labels={'site': 'north\\"2"\nwing'})
+    solve_flow(random_preferences(), sinks=[sink])
+    with open(textfile) as f:
+        metrics = f.read()
+    assert 'schedule_objective{engine="flow",site="north\\\\\\"2\\"\\nwing"}' in metrics
+    assert all(line.startswith('schedule_') or line.startswith('# ') for line in metrics.splitlines())
+
+
+def test_json_log_to_file(tmp_path):
+    path = str(tmp_path / 'solves.jsonl')
+    solve_flow(random_preferences(), sinks=[JsonLogSink(path=path)])
+    solve_flow(random_preferences(1), sinks=[JsonLogSink(path=path)])
+    with open(path) as f:
+        assert [json.loads(line)['engine'] for line in f] == ['flow', 'flow']
+
+
+def test_session_reports_every_solve():
+    session = ScheduleSession(random_preferences())
+    first = session.solve().report
+    session.set_preference(0, 0, 0)
+    second = session.solve().report
+    assert 'variables' in first.phases
+    assert list(second.phases) == ['hints', 'solve', 'extract']
+
+
+class SlowWorker:
+    def __init__(self, name, shifts):
+        self.name = name
+        self.shifts = shifts
+
+    def get_shifts_array(self):
+        time.sleep(0.01)
+        return self.shifts
+
+
+def test_preference_extraction_is_timed(capsys):
+    prefs = random_preferences()
+    result = main.calculate_shifts([SlowWorker('w%i' % n, prefs[n].ravel().tolist()) for n in range(8)])
+    assert result.optimal
+    assert result.report.phases['preferences'] >= 0.08
+    assert list(result.report.phases) == ['preferences', 'network', 'solve', 'extract']